@@ -1,13 +1,18 @@
 import argparse
 import asyncio
-import json
+import atexit
+import functools
+import hashlib
 import os
 import random
 import re
+import sqlite3
 import time
 from collections import Counter  # <--- Added for aggregation
-from datetime import datetime, timedelta
+from datetime import datetime
 
+import httpx
+import orjson
 import pandas as pd
 from google import genai
 from google.genai import types
@@ -24,21 +29,82 @@ LITE_MODEL = "gemini-2.5-flash"  # remove this.
 PROD_CSV = "backbone_locations.csv"
 DEV_CSV = "backbone_locations_dev.csv"
 LOG_FILE = "pipeline_execution.log"
+LOG_FLUSH_EVERY = 50  # Log events buffered before a forced flush
+LOG_FLUSH_SECONDS = 1.0  # Idle writer flushes whatever is buffered after this
 TAXONOMY_FILE = "taxonomy.json"  # Source of truth for tags
 LLM_PROMPT_FILE = "llm_prompt.txt"  # File containing the LLM prompt
 
-AI_DELAY = 1.0
+AI_DELAY = 1.0  # Base backoff (seconds) between Gemini retries
+GEMINI_RPM = 60  # Gemini requests allowed per minute (token bucket size)
+GEMINI_MAX_CONNECTIONS = 16  # Pooled keep-alive connections to the Gemini API
+GEMINI_CONCURRENCY = 4  # Gemini requests allowed in flight at once
+AI_CACHE_FILE = "gemini_cache.sqlite"  # Per-review Gemini answers reused across runs
+AI_CACHE_DAYS = 90  # Cached answers older than this are pruned
+STALENESS_COLUMNS = ["p4n_id", "last_scraped"]  # All _load_existing reads for a run
+SCRAPE_TIMEOUT = 90  # Seconds one page scrape may take before it is abandoned
+SAVE_EVERY = 25  # Tag and flush scraped rows to the CSV every N places
+CONTEXT_ROTATE_PAGES = 50  # Recycle the browser context after N pages to cap leaks
 STALENESS_DAYS = 30
 MIN_REVIEWS_THRESHOLD = 5
 DEV_LIMIT = 1
 REVIEW_YEARS = 2  # Only count reviews from the last N years
+REVIEW_MAX_CHARS = 400  # Longer reviews are truncated before tagging
+REVIEW_MIN_CHARS = 10  # Shorter reviews ("Top!") carry no taggable content
+
+AI_LIST_KEYS = ("reviews", "data", "results", "output")  # Wrappers Gemini may put around the list
+
+# Requests the scraper never reads; aborting them keeps page loads small.
+BLOCKED_RESOURCE_TYPES = frozenset(
+    {"image", "font", "media", "stylesheet", "texttrack", "manifest"}
+)
+BLOCKED_HOSTS_RE = re.compile(
+    r"doubleclick|googletagmanager|analytics|facebook\.net|hotjar"
+)
+
+COUNT_RE = re.compile(r"(\d+)")
+LATLNG_RE = re.compile(r"lat=([-+]?\d*\.?\d+)&lng=([-+]?\d*\.?\d+)")  # No alternation to backtrack on
+RATING_RE = re.compile(r"(\d+\.?\d*)")
+# Server-suggested wait in a 429 ("retryDelay': '37s'" or "retry in 37.5s").
+RETRY_DELAY_RE = re.compile(r"retry(?:delay\W*|\s+in\s+)(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+# /dev/shm is tiny on CI runners; Chromium falls back to /tmp with this flag.
+BROWSER_ARGS = ["--disable-dev-shm-usage", "--disable-extensions"]
 
 URL_LIST_FILE = "url_list.txt"
 STATE_FILE = "queue_state.json"
+BROWSER_STATE_FILE = "p4n_state.json"  # Cookies/consent reused across runs
+BROWSER_STATE_MAX_AGE_DAYS = 7  # Older saved state is ignored and rebuilt
+
+# Reads every field extract_atomic needs in a single CDP round-trip.
+PLACE_EXTRACT_JS = """() => {
+    const text = (sel) => document.querySelector(sel)?.textContent ?? null;
+    const dl = {};
+    for (const dt of document.querySelectorAll("dt")) {
+        const dd = dt.nextElementSibling;
+        if (dd && dd.tagName === "DD" && !(dt.textContent.trim() in dl)) {
+            dl[dt.textContent.trim()] = dd.textContent.trim();
+        }
+    }
+    return {
+        count_text: text(".place-feedback-average strong"),
+        rating_text: text(".place-feedback-average .text-gray"),
+        place_id: document.body.getAttribute("data-place-id"),
+        title: text("h1"),
+        coord_href: document.querySelector("a[href*='lat='][href*='lng=']")?.getAttribute("href") ?? null,
+        location_type: document.querySelector(".place-header-access img")?.getAttribute("title") ?? null,
+        dl,
+        reviews: [...document.querySelectorAll(".place-feedback-article")].map((a) => [
+            a.querySelector("span.caption.text-gray")?.textContent ?? null,
+            a.querySelector(".place-feedback-article-content")?.textContent ?? null,
+        ]),
+    };
+}"""
 
 GEMINI_API_KEY = os.environ.get("GOOGLE_API_KEY")
 P4N_USER = os.environ.get("P4N_USERNAME")
 P4N_PASS = os.environ.get("P4N_PASSWORD")
+# Attach to an already running, shared Chromium instead of launching one.
+BROWSER_CDP_URL = os.environ.get("BROWSER_CDP_URL")
 
 
 def ts_print(msg):
@@ -46,74 +112,333 @@ def ts_print(msg):
     print(f"[{timestamp}] {msg}", flush=True)
 
 
-def is_review_within_years(date_str, years=REVIEW_YEARS):
-    """Check if review date is within the last N years. Date format: YYYY-MM-DD"""
+def bucket_reviews(review_rows, years=REVIEW_YEARS):
+    """Keep (DD/MM/YYYY, text) reviews from the last N years.
+
+    Returns the "[YYYY-MM-DD]: text" strings sent to Gemini and a
+    {"YYYY-MM": count} seasonality histogram, parsing all dates in one pass.
+    Texts sent to Gemini are whitespace-collapsed, truncated, and stripped of
+    duplicates and very short reviews; the histogram still counts every review.
+    """
+    rows = [(d, t) for d, t in review_rows if d and t is not None]
+    if not rows:
+        return [], {}
+    date_texts, texts = zip(*rows)
+    dates = pd.to_datetime(
+        pd.Series(date_texts).str.strip(), format="%d/%m/%Y", errors="coerce"
+    )
+    mask = (dates >= pd.Timestamp.now() - pd.Timedelta(days=years * 365)).to_numpy()
+    kept = dates[mask]
+    seasonality = kept.dt.strftime("%Y-%m").value_counts(sort=False)
+    kept_texts = [t for t, keep in zip(texts, mask) if keep]
+    formatted, seen = [], set()
+    for d, t in zip(kept, kept_texts):
+        text = " ".join(t.split())[:REVIEW_MAX_CHARS]
+        if len(text) < REVIEW_MIN_CHARS or text in seen:
+            continue
+        seen.add(text)
+        formatted.append(f"[{d:%Y-%m-%d}]: {text}")
+    return formatted, {k: int(v) for k, v in seasonality.items()}
+
+
+def read_csv_fast(path, **kwargs):
+    """pd.read_csv on the multithreaded pyarrow engine when it is available."""
     try:
-        review_date = datetime.strptime(date_str, "%Y-%m-%d")
-        cutoff_date = datetime.now() - timedelta(days=years * 365)
-        return review_date >= cutoff_date
-    except:
-        return False
+        return pd.read_csv(path, engine="pyarrow", **kwargs)
+    except (ImportError, ValueError):
+        # pyarrow missing, or an option/value its parser rejects.
+        return pd.read_csv(path, **kwargs)
+
+
+def retry_delay(attempt, err_msg=""):
+    """Seconds to wait before Gemini retry `attempt` (1-based).
+
+    Honours the delay a 429 asks for, else backs off exponentially; both
+    get +/-25% jitter so parallel workers do not retry in lockstep.
+    """
+    match = RETRY_DELAY_RE.search(err_msg)
+    delay = float(match.group(1)) if match else AI_DELAY * 2 ** (attempt - 1)
+    return delay * random.uniform(0.75, 1.25)
+
+
+def parse_ai_response(text):
+    """Decode a Gemini answer, unwrapping the review list if nested in an object."""
+    text = text.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+    parsed = orjson.loads(text.strip())
+    if isinstance(parsed, dict):
+        for k in AI_LIST_KEYS:
+            if isinstance(parsed.get(k), list):
+                return parsed[k]
+    return parsed
+
+
+async def block_heavy_resources(route):
+    """Playwright route handler that aborts assets and known trackers."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_HOSTS_RE.search(
+        request.url
+    ):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_system_instruction():
+    """Format the LLM prompt with the taxonomy blocks once per process."""
+    with open(TAXONOMY_FILE, "rb") as f:
+        tax_data = orjson.loads(f.read())
+    pro_list = [f"- {item['topic']}: {item['description']}" for item in tax_data.get("pros", []) if isinstance(item, dict)]
+    con_list = [f"- {item['topic']}: {item['description']}" for item in tax_data.get("cons", []) if isinstance(item, dict)]
+    pro_taxonomy_block, con_taxonomy_block = "\n".join(pro_list), "\n".join(con_list)
+
+    with open(LLM_PROMPT_FILE, "r", encoding="utf-8") as f:
+        return f.read().replace("{pro_taxonomy_block}", pro_taxonomy_block).replace("{con_taxonomy_block}", con_taxonomy_block)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_generate_config():
+    """GenerateContentConfig shared by every review-tagging call."""
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        temperature=0.0,
+        system_instruction=_load_system_instruction(),
+    )
 
 
 class PipelineLogger:
-    _initialized = False
-
-    @staticmethod
-    def log_event(event_type, data):
-        processed_content = {}
-        for k, v in data.items():
-            if isinstance(v, str) and (
-                v.strip().startswith("{") or v.strip().startswith("[")
-            ):
-                try:
-                    processed_content[k] = json.loads(v)
-                except:
-                    processed_content[k] = v
-            else:
-                processed_content[k] = v
-
+    _fh = None
+    _unflushed = 0
+    _queue = None
+    _writer = None
+    _loop = None
+
+    @classmethod
+    def _handle(cls):
+        # Truncate once per process, then keep a single buffered handle open.
+        if cls._fh is None:
+            cls._fh = open(LOG_FILE, "wb", buffering=1 << 16)
+            atexit.register(cls.close)
+        return cls._fh
+
+    @classmethod
+    def log_event(cls, event_type, data):
+        # Values are logged as-is: JSON strings stay strings, with no reparse.
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "type": event_type,
-            "content": processed_content,
+            "content": data,
         }
-        mode = "w" if not PipelineLogger._initialized else "a"
-        if not PipelineLogger._initialized:
-            PipelineLogger._initialized = True
-
-        with open(LOG_FILE, mode, encoding="utf-8") as f:
-            header = f"\n{'='*30} {event_type} {'='*30}\n"
-            f.write(
-                header
-                + json.dumps(log_entry, indent=4, default=str, ensure_ascii=False)
-                + "\n"
+        # One JSON object per line (NDJSON) so the log can be streamed.
+        line = (
+            orjson.dumps(log_entry, default=str, option=orjson.OPT_NON_STR_KEYS)
+            + b"\n"
+        )
+        queue = cls._queue
+        if queue is None:
+            cls._write(line, 1)
+        elif cls._on_writer_loop():
+            queue.put_nowait(line)
+        else:
+            # asyncio.Queue is not thread-safe; hop onto the writer's loop.
+            cls._loop.call_soon_threadsafe(queue.put_nowait, line)
+
+    @classmethod
+    def _on_writer_loop(cls):
+        try:
+            return asyncio.get_running_loop() is cls._loop
+        except RuntimeError:
+            return False
+
+    @classmethod
+    def _write(cls, blob, count):
+        cls._handle().write(blob)
+        # Bound what a hard crash can lose without a syscall per event.
+        cls._unflushed += count
+        if cls._unflushed >= LOG_FLUSH_EVERY:
+            cls.flush()
+
+    @classmethod
+    def start_writer(cls):
+        """Hand file writes to a background task so they leave the event loop."""
+        cls._loop = asyncio.get_running_loop()
+        cls._queue = asyncio.Queue()
+        cls._writer = asyncio.create_task(cls._drain(cls._queue))
+
+    @classmethod
+    async def stop_writer(cls):
+        """Drain queued events, then fall back to direct writes."""
+        if cls._queue is None:
+            return
+        queue, cls._queue = cls._queue, None
+        await queue.put(None)
+        await cls._writer
+        cls._writer = None
+        cls.flush()
+
+    @classmethod
+    async def _drain(cls, queue):
+        while True:
+            try:
+                batch = [await asyncio.wait_for(queue.get(), LOG_FLUSH_SECONDS)]
+            except asyncio.TimeoutError:
+                # Quiet spell: push the tail out so `tail -f` stays current.
+                if cls._unflushed:
+                    await asyncio.to_thread(cls.flush)
+                continue
+            while not queue.empty() and len(batch) < LOG_FLUSH_EVERY:
+                batch.append(queue.get_nowait())
+            lines = [line for line in batch if line is not None]
+            if lines:
+                await asyncio.to_thread(cls._write, b"".join(lines), len(lines))
+            if None in batch:
+                return
+
+    @classmethod
+    def flush(cls):
+        if cls._fh is not None:
+            cls._fh.flush()
+        cls._unflushed = 0
+
+    @classmethod
+    def close(cls):
+        if cls._fh is not None:
+            cls._fh.close()
+            cls._fh = None
+
+
+class AsyncRateLimiter:
+    """Token bucket: bursts up to `max_rate` calls, refilled over `period` seconds."""
+
+    def __init__(self, max_rate, period=60.0):
+        self.max_rate = max_rate
+        self.refill_per_sec = max_rate / period
+        self._tokens = float(max_rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.max_rate,
+                    self._tokens + (now - self._updated) * self.refill_per_sec,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return self
+                await asyncio.sleep((1 - self._tokens) / self.refill_per_sec)
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class ReviewCache:
+    """sqlite store of per-review Gemini answers.
+
+    Keys hash the system prompt, model and review text, so editing the
+    taxonomy or prompt naturally misses the old entries.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer BLOB, ts REAL)"
+        )
+        self.conn.execute(
+            "DELETE FROM answers WHERE ts < ?", (time.time() - AI_CACHE_DAYS * 86400,)
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def key(salt, model_name, review):
+        raw = f"{salt}\0{model_name}\0{review}".encode()
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(set(keys))
+        # Stay under sqlite's bound-parameter limit.
+        for i in range(0, len(keys), 500):
+            batch = keys[i : i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, answer FROM answers WHERE key IN ({','.join('?' * len(batch))})",
+                batch,
             )
+            found.update((k, orjson.loads(answer)) for k, answer in rows)
+        return found
+
+    def put_many(self, items):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO answers VALUES (?, ?, ?)",
+            [(k, orjson.dumps(answer), now) for k, answer in items],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
 
 
 class DailyQueueManager:
     @staticmethod
-    def get_next_partition(batch_size=1):
+    @functools.lru_cache(maxsize=1)
+    def _load_urls(path, mtime):
+        # Keyed on mtime so an edited list is picked up, otherwise read once.
+        with open(path, "r") as f:
+            return tuple(line.strip() for line in f if line.strip())
+
+    @staticmethod
+    def _read_urls():
         if not os.path.exists(URL_LIST_FILE):
+            return None
+        return DailyQueueManager._load_urls(
+            URL_LIST_FILE, os.path.getmtime(URL_LIST_FILE)
+        )
+
+    @staticmethod
+    def _read_state():
+        state = {"current_index": 0}
+        if os.path.exists(STATE_FILE):
+            try:
+                with open(STATE_FILE, "rb") as f:
+                    state = orjson.loads(f.read())
+            except Exception as e:
+                ts_print(f"⚠️ [QUEUE] Unreadable {STATE_FILE} ({e}); restarting from 0.")
+                return {"current_index": 0}
+        if not isinstance(state, dict):
+            ts_print(f"⚠️ [QUEUE] Unexpected {STATE_FILE} content {state!r}; restarting from 0.")
+            return {"current_index": 0}
+        return state
+
+    @staticmethod
+    def _current_index(state, urls):
+        # A corrupt or out-of-range cursor restarts the queue from the top.
+        idx = state.get("current_index", 0)
+        if not isinstance(idx, int) or not 0 <= idx < len(urls):
+            ts_print(
+                f"⚠️ [QUEUE] Invalid current_index {idx!r} in {STATE_FILE} "
+                f"({len(urls)} URLs); restarting from 0."
+            )
+            return 0
+        return idx
+
+    @staticmethod
+    def get_next_partition(batch_size=1):
+        urls = DailyQueueManager._read_urls()
+        if urls is None:
             ts_print(f"❌ ERROR: {URL_LIST_FILE} not found.")
             return [], 0, 0
-        with open(URL_LIST_FILE, "r") as f:
-            urls = [line.strip() for line in f if line.strip()]
 
         if not urls:
             return [], 0, 0
 
-        state = {"current_index": 0}
-        if os.path.exists(STATE_FILE):
-            try:
-                with open(STATE_FILE, "r") as f:
-                    state = json.load(f)
-            except:
-                pass
-
-        start_idx = state.get("current_index", 0)
-        if start_idx >= len(urls):
-            start_idx = 0
+        state = DailyQueueManager._read_state()
+        start_idx = DailyQueueManager._current_index(state, urls)
 
         target_urls = []
         # Fetch 'batch_size' URLs, wrapping around if necessary
@@ -125,34 +450,45 @@ class DailyQueueManager:
 
     @staticmethod
     def increment_state(batch_size=1):
-        if not os.path.exists(URL_LIST_FILE):
-            return
-        with open(URL_LIST_FILE, "r") as f:
-            urls = [line.strip() for line in f if line.strip()]
-
+        urls = DailyQueueManager._read_urls()
         if not urls:
             return
 
-        state = {"current_index": 0}
-        if os.path.exists(STATE_FILE):
-            try:
-                with open(STATE_FILE, "r") as f:
-                    state = json.load(f)
-            except:
-                pass
+        state = DailyQueueManager._read_state()
 
         # Advance index by batch_size, wrapping modulo length of list
-        state["current_index"] = (state.get("current_index", 0) + batch_size) % len(
-            urls
-        )
+        state["current_index"] = (
+            DailyQueueManager._current_index(state, urls) + batch_size
+        ) % len(urls)
 
-        with open(STATE_FILE, "w") as f:
-            json.dump(state, f)
+        # Write then rename so a crash mid-write cannot corrupt the cursor.
+        tmp_file = f"{STATE_FILE}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(orjson.dumps(state))
+        os.replace(tmp_file, STATE_FILE)
 
 
 client = genai.Client(api_key=GEMINI_API_KEY)
 
 
+def pooled_gemini_client():
+    """A Gemini client on its own pooled httpx client, returned alongside it.
+
+    Connections and TLS sessions are reused across chunks instead of
+    renegotiated; the SDK leaves closing the httpx client to the caller.
+    """
+    http = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=GEMINI_MAX_CONNECTIONS,
+        )
+    )
+    return http, genai.Client(
+        api_key=GEMINI_API_KEY,
+        http_options=types.HttpOptions(httpx_async_client=http),
+    )
+
+
 class P4NScraper:
     def __init__(
         self, is_dev=False, force=False, single_url=None, search_url=None, batch_size=1
@@ -164,7 +500,15 @@ class P4NScraper:
         self.batch_size = batch_size
         self.csv_file = DEV_CSV if is_dev else PROD_CSV
         self.processed_batch = []
-        self.existing_df = self._load_existing()
+        self.pending_ai = []  # Scraped rows awaiting batched AI tagging
+        self._ai_tasks = set()  # Tagging batches running behind the scrapers
+        self.existing_df = pd.DataFrame()  # Loaded in start(), overlapped with launch
+        self.browser = None
+        self.context = None  # Current context; see _new_page for rotation
+        self._context_lock = asyncio.Lock()
+        self._save_lock = asyncio.Lock()  # One CSV write at a time
+        self._pages_opened = 0
+        self._state_built_at = None  # mtime of the reused browser state, if any
         self.stats = {
             "read": 0,
             "discarded_fresh": 0,
@@ -172,299 +516,542 @@ class P4NScraper:
             "gemini_flash_calls": 0,
             "gemini_lite_calls": 0,
             "gemini_errors": 0,
+            "gemini_cache_hits": 0,
         }
         self.semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
-
-    def _load_existing(self):
+        self.client = client  # Pooled per run while start() is active
+        self.ai_limiter = AsyncRateLimiter(GEMINI_RPM)
+        self.ai_semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+        self._ai_cache = None  # Opened on first use; dev runs never cache
+        self._ai_cache_off = False  # Set after a cache failure for the run
+
+    def _load_existing(self, usecols=STALENESS_COLUMNS):
+        # The run only needs ids and dates; an unreadable store counts as empty.
         if os.path.exists(self.csv_file):
             try:
-                df = pd.read_csv(self.csv_file)
-                df["last_scraped"] = pd.to_datetime(df["last_scraped"], errors="coerce")
-                return df
+                return self._read_store(usecols)
             except:
                 pass
         return pd.DataFrame()
 
+    def _read_store(self, usecols=None):
+        """Read the CSV store, raising instead of guessing on failure."""
+        df = read_csv_fast(self.csv_file, usecols=usecols, dtype={"p4n_id": str})
+        # Normalize ids once here so callers never re-cast the column.
+        df["p4n_id"] = df["p4n_id"].astype(str).str.strip().replace("nan", "")
+        df = df[df["p4n_id"].astype(bool)].copy()
+        df["last_scraped"] = pd.to_datetime(df["last_scraped"], errors="coerce")
+        return df
+
     async def analyze_with_ai(self, raw_data, model_name, url):
-        # 1. Setup call stats and Load Taxonomy (Original Logic)
+        """Tag the reviews of a single place (see analyze_batch_with_ai)."""
+        results = await self.analyze_batch_with_ai([(raw_data, url)], model_name)
+        return results[0]
+
+    async def analyze_batch_with_ai(self, payloads, model_name):
+        """Tag the reviews of several places with shared Gemini calls.
+
+        `payloads` is a list of (raw_data, url). Reviews from all places are
+        packed into chunks of MAX_REVIEWS_PER_CALL and each answer is routed
+        back to its place through the prompt's per-review "id" index.
+        Returns one aggregated dict per payload, in order.
+        """
+        # 1. Load the cached Gemini config (taxonomy + prompt)
         try:
-            with open(TAXONOMY_FILE, "r", encoding="utf-8") as f:
-                tax_data = json.load(f)
-                pro_list = [f"- {item['topic']}: {item['description']}" for item in tax_data.get("pros", []) if isinstance(item, dict)]
-                con_list = [f"- {item['topic']}: {item['description']}" for item in tax_data.get("cons", []) if isinstance(item, dict)]
-                pro_taxonomy_block, con_taxonomy_block = "\n".join(pro_list), "\n".join(con_list)
-
-            with open(LLM_PROMPT_FILE, "r", encoding="utf-8") as f:
-                system_instruction = f.read().replace("{pro_taxonomy_block}", pro_taxonomy_block).replace("{con_taxonomy_block}", con_taxonomy_block)
+            config = _load_generate_config()
         except Exception as e:
             ts_print(f"❌ FAILED TO LOAD TAXONOMY OR PROMPT: {e}")
-            return {}
-
-        reviews_list = raw_data.get("all_reviews", [])
-        if not reviews_list:
-            return {}
+            return [{} for _ in payloads]
 
         # --- CHUNKING & AGGREGATION SETUP ---
-        chunks = [reviews_list[i : i + MAX_REVIEWS_PER_CALL] for i in range(0, len(reviews_list), MAX_REVIEWS_PER_CALL)]
-        aggregated_pros = Counter()
-        aggregated_cons = Counter()
-        
-        config = types.GenerateContentConfig(
-            response_mime_type="application/json",
-            temperature=0.0,
-            system_instruction=system_instruction,
-        )
-
-        # Use enumerate to fix the 'chunk_idx' error
-        for chunk_idx, chunk in enumerate(chunks):
-            ts_print(f"🤖 [CHUNK {chunk_idx + 1}/{len(chunks)}] Analyzing {len(chunk)} reviews...")
-
-            json_payload = json.dumps(chunk, default=str, ensure_ascii=False)
-            
-            if model_name == FLASH_MODEL: self.stats["gemini_flash_calls"] += 1
-            else: self.stats["gemini_lite_calls"] += 1
-
-            PipelineLogger.log_event("SENT_TO_GEMINI", {
-                "chunk": f"{chunk_idx + 1}/{len(chunks)}", 
-                "payload_size": len(chunk), 
-                "model": model_name
-            })
-
-            for attempt in range(MAX_GEMINI_RETRIES):
-                try:
-                    await asyncio.sleep(AI_DELAY * (attempt + 1))
-                    response = await client.aio.models.generate_content(
+        # (place index, review) pairs, so a chunk may span several places
+        tagged = [
+            (place_idx, review)
+            for place_idx, (raw_data, _) in enumerate(payloads)
+            for review in raw_data.get("all_reviews", [])
+        ]
+        aggregated_pros = [Counter() for _ in payloads]
+        aggregated_cons = [Counter() for _ in payloads]
+
+        # Reviews tagged by an earlier run are answered from the cache.
+        cache = self._get_ai_cache()
+        keys = [None] * len(tagged)
+        if cache is not None:
+            salt = hashlib.blake2b(
+                str(getattr(config, "system_instruction", "")).encode(), digest_size=16
+            ).hexdigest()
+            keys = [ReviewCache.key(salt, model_name, review) for _, review in tagged]
+            try:
+                cached = cache.get_many(keys)
+            except (sqlite3.Error, orjson.JSONDecodeError) as e:
+                # Locked, corrupt or truncated: every review is a miss.
+                self._disable_ai_cache(e)
+                cached = {}
+            self.stats["gemini_cache_hits"] += sum(k in cached for k in keys)
+            for (place_idx, _), key in zip(tagged, keys):
+                if key in cached:
+                    aggregated_pros[place_idx].update(cached[key].get("pros", []))
+                    aggregated_cons[place_idx].update(cached[key].get("cons", []))
+            misses = [
+                (place_idx, review, key)
+                for (place_idx, review), key in zip(tagged, keys)
+                if key not in cached
+            ]
+        else:
+            misses = [(place_idx, review, None) for place_idx, review in tagged]
+
+        chunks = [misses[i : i + MAX_REVIEWS_PER_CALL] for i in range(0, len(misses), MAX_REVIEWS_PER_CALL)]
+
+        # 2. Chunks are independent, so their Gemini calls run concurrently
+        results = await asyncio.gather(*(
+            self._analyze_chunk(
+                [review for _, review, _ in chunk],
+                f"{chunk_idx + 1}/{len(chunks)}",
+                model_name,
+                config,
+                ", ".join(dict.fromkeys(payloads[place_idx][1] for place_idx, _, _ in chunk)),
+            )
+            for chunk_idx, chunk in enumerate(chunks)
+        ))
+        fresh_answers = []
+        for chunk, answers in zip(chunks, results):
+            for review_idx, item in answers:
+                place_idx, _, key = chunk[review_idx]
+                aggregated_pros[place_idx].update(item.get("pros", []))
+                aggregated_cons[place_idx].update(item.get("cons", []))
+                if key is not None:
+                    fresh_answers.append(
+                        (key, {"pros": item.get("pros", []), "cons": item.get("cons", [])})
+                    )
+        if fresh_answers and not self._ai_cache_off:
+            try:
+                cache.put_many(fresh_answers)
+            except sqlite3.Error as e:
+                # The answers are already paid for; keep them for this run.
+                self._disable_ai_cache(e)
+
+        # 3. Construct results matching old schema for compatibility
+        aggregated = []
+        for place_idx, (raw_data, url) in enumerate(payloads):
+            if not raw_data.get("all_reviews"):
+                aggregated.append({})
+                continue
+            aggregated_json = {
+                "num_places": raw_data.get("places_count"),
+                "parking_min": None, "parking_max": None, "electricity_eur": None, "top_languages": [],
+                "pros_cons": {
+                    "pros": [{"topic": k, "count": v} for k, v in aggregated_pros[place_idx].items()],
+                    "cons": [{"topic": k, "count": v} for k, v in aggregated_cons[place_idx].items()],
+                },
+            }
+            PipelineLogger.log_event("GEMINI_ANSWER", {"model": model_name, "url": url, "response": aggregated_json})
+            aggregated.append(aggregated_json)
+        return aggregated
+
+    def _get_ai_cache(self):
+        """Open the per-review answer cache lazily; None in dev mode."""
+        if self.is_dev or self._ai_cache_off:
+            return None
+        if self._ai_cache is None:
+            try:
+                self._ai_cache = ReviewCache(AI_CACHE_FILE)
+            except sqlite3.Error as e:
+                self._disable_ai_cache(e)
+                return None
+        return self._ai_cache
+
+    def _disable_ai_cache(self, error):
+        """Carry on without the cache for the rest of the run; it only saves calls."""
+        ts_print(f"⚠️ Gemini cache unavailable, continuing without it: {error}")
+        PipelineLogger.log_event("AI_CACHE_ERROR", {"error": str(error)})
+        self._ai_cache_off = True
+
+    async def _analyze_chunk(self, chunk, chunk_label, model_name, config, url):
+        """Tag one chunk of reviews; returns (review index, answer) pairs."""
+        answers = []
+        ts_print(f"🤖 [CHUNK {chunk_label}] Analyzing {len(chunk)} reviews...")
+
+        # Serialize once; the same prompt string is reused for every retry.
+        payload = orjson.dumps(chunk, default=str)
+        contents = (b"ANALYZE REVIEWS:\n" + payload).decode()
+
+        if model_name == FLASH_MODEL: self.stats["gemini_flash_calls"] += 1
+        else: self.stats["gemini_lite_calls"] += 1
+
+        PipelineLogger.log_event("SENT_TO_GEMINI", {
+            "chunk": chunk_label,
+            "payload_size": len(chunk),
+            "payload_bytes": len(payload),
+            "model": model_name
+        })
+
+        err_msg = ""
+        for attempt in range(MAX_GEMINI_RETRIES):
+            try:
+                # Only retries wait, for as long as the last error asked
+                if attempt > 0:
+                    await asyncio.sleep(retry_delay(attempt, err_msg))
+                # The limiter paces request starts; the semaphore caps how
+                # many are in flight while a slow answer is pending.
+                async with self.ai_limiter, self.ai_semaphore:
+                    response = await self.client.aio.models.generate_content(
                         model=model_name,
-                        contents=f"ANALYZE REVIEWS:\n{json_payload}",
+                        contents=contents,
                         config=config,
                     )
 
-                    clean_text = re.sub(r"```json\s*|\s*```", "", response.text).strip()
-                    ai_response_list = json.loads(clean_text)
-
-                    if isinstance(ai_response_list, dict):
-                        for k in ["reviews", "data", "results", "output"]:
-                            if k in ai_response_list and isinstance(ai_response_list[k], list):
-                                ai_response_list = ai_response_list[k]
-                                break
-
-                    if isinstance(ai_response_list, list):
-                        # ADD THIS LOG ENTRY TO SEE INDIVIDUAL CHUNK ANSWERS
-                        PipelineLogger.log_event("GEMINI_CHUNK_ANSWER", {
-                            "chunk": f"{chunk_idx + 1}/{len(chunks)}",
-                            "response_count": len(ai_response_list)
-                        })
-
-                        for item in ai_response_list:
-                            if isinstance(item, dict):
-                                for p in item.get("pros", []): aggregated_pros[p] += 1
-                                for c in item.get("cons", []): aggregated_cons[c] += 1
-                        break
-
-                except (json.JSONDecodeError, Exception) as e:
-                    err_msg = str(e).lower()
-                    is_transient = any(x in err_msg for x in ["503", "overloaded", "deadline"])
-                    if (isinstance(e, json.JSONDecodeError) or is_transient) and attempt < MAX_GEMINI_RETRIES - 1:
-                        continue
-                    ts_print(f"❌ [GEMINI ERROR] Chunk {chunk_idx+1} URL: {url} | Error: {e}")
-                    self.stats["gemini_errors"] += 1
-
-        # 3. Construct result matching old schema for compatibility
-        aggregated_json = {
-            "num_places": raw_data.get("places_count"),
-            "parking_min": None, "parking_max": None, "electricity_eur": None, "top_languages": [],
-            "pros_cons": {
-                "pros": [{"topic": k, "count": v} for k, v in aggregated_pros.items()],
-                "cons": [{"topic": k, "count": v} for k, v in aggregated_cons.items()],
-            },
-        }
+                ai_response_list = parse_ai_response(response.text)
+
+                if isinstance(ai_response_list, list):
+                    PipelineLogger.log_event("GEMINI_CHUNK_ANSWER", {
+                        "chunk": chunk_label,
+                        "response_count": len(ai_response_list)
+                    })
+
+                    for pos, item in enumerate(ai_response_list):
+                        if not isinstance(item, dict):
+                            continue
+                        # Trust the model's "id" when valid, else its position
+                        review_idx = item.get("id")
+                        if not isinstance(review_idx, int) or not 0 <= review_idx < len(chunk):
+                            review_idx = pos
+                        if review_idx < len(chunk):
+                            answers.append((review_idx, item))
+                    break
 
-        PipelineLogger.log_event("GEMINI_ANSWER", {"model": model_name, "response": aggregated_json})
-        return aggregated_json
+            except (orjson.JSONDecodeError, Exception) as e:
+                err_msg = str(e).lower()
+                is_transient = any(
+                    x in err_msg
+                    for x in ["503", "overloaded", "deadline", "429", "resource_exhausted"]
+                )
+                if (isinstance(e, orjson.JSONDecodeError) or is_transient) and attempt < MAX_GEMINI_RETRIES - 1:
+                    continue
+                ts_print(f"❌ [GEMINI ERROR] Chunk {chunk_label} URL: {url} | Error: {e}")
+                self.stats["gemini_errors"] += 1
+                break
+
+        return answers
+
+    async def _analyze_pending(self):
+        """Run AI tagging for every scraped place, packing places per model."""
+        by_model = {}
+        for entry in self.pending_ai:
+            by_model.setdefault(entry["model"], []).append(entry)
+        self.pending_ai = []
+
+        # Models are tagged concurrently; the rate limiter bounds the burst.
+        groups = list(by_model.items())
+        results = await asyncio.gather(*(
+            self.analyze_batch_with_ai(
+                [(entry["payload"], entry["row"]["url"]) for entry in entries], model_name
+            )
+            for model_name, entries in groups
+        ), return_exceptions=True)
+        for (model_name, entries), model_results in zip(groups, results):
+            if isinstance(model_results, Exception):
+                # The scrape itself is still worth saving, just without tags.
+                ts_print(f"⚠️ Error during AI analysis ({model_name}): {model_results}")
+                PipelineLogger.log_event(
+                    "AI_ERROR", {"model": model_name, "error": str(model_results)}
+                )
+                model_results = [{} for _ in entries]
+            elif isinstance(model_results, BaseException):
+                raise model_results
+            for entry, ai_data in zip(entries, model_results):
+                self._store_row(entry["row"], ai_data)
+
+        if len(self.processed_batch) >= SAVE_EVERY:
+            await self._flush_batch()
+
+    def _store_row(self, row, ai_data):
+        """Fill a scraped row with its AI fields and queue it for saving."""
+        top_langs = ai_data.get("top_languages", [])
+        pros_cons = ai_data.get("pros_cons") or {}
+        row.update({
+            "num_places": ai_data.get("num_places"),
+            "parking_min_eur": ai_data.get("parking_min"),
+            "parking_max_eur": ai_data.get("parking_max"),
+            "electricity_eur": ai_data.get("electricity_eur"),
+            "top_languages": "; ".join(
+                [
+                    f"{l.get('lang')} ({l.get('count')})"
+                    for l in top_langs
+                    if isinstance(l, dict)
+                ]
+            ),
+            "ai_pros": "; ".join(
+                [
+                    f"{p.get('topic')} ({p.get('count')})"
+                    for p in pros_cons.get("pros", [])
+                    if isinstance(p, dict)
+                ]
+            ),
+            "ai_cons": "; ".join(
+                [
+                    f"{c.get('topic')} ({c.get('count')})"
+                    for c in pros_cons.get("cons", [])
+                    if isinstance(c, dict)
+                ]
+            ),
+        })
+        PipelineLogger.log_event("STORED_ROW", row)
+        self.processed_batch.append(row)
+
+    async def extract_atomic(self, url, current_num, total_num):
+        async with self.semaphore:
+            # A hung page must not stall the whole TaskGroup.
+            try:
+                await asyncio.wait_for(
+                    self._scrape_place(url, current_num, total_num),
+                    timeout=SCRAPE_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                ts_print(f"⏱️ Timed out after {SCRAPE_TIMEOUT}s: {url}")
+                PipelineLogger.log_event("SCRAPE_TIMEOUT", {"url": url})
+
+        # Tag and save every SAVE_EVERY places so a crash mid-crawl only
+        # loses the current batch. The batch runs as a background task so
+        # this slot goes straight back to scraping.
+        if len(self.pending_ai) >= SAVE_EVERY:
+            task = asyncio.create_task(self._analyze_in_background())
+            self._ai_tasks.add(task)
+            task.add_done_callback(self._ai_tasks.discard)
+
+    async def _analyze_in_background(self):
+        try:
+            await self._analyze_pending()
+        except Exception as e:
+            ts_print(f"⚠️ Error during AI analysis: {e}")
+            PipelineLogger.log_event("AI_ERROR", {"error": str(e)})
 
+    async def _scrape_place(self, url, current_num, total_num):
+        if self.is_dev and self.stats["read"] >= DEV_LIMIT:
+            return
 
-    async def extract_atomic(self, context, url, current_num, total_num):
-        async with self.semaphore:
-            if self.is_dev and self.stats["read"] >= DEV_LIMIT:
-                return
+        ts_print(f"➡️  [{current_num}/{total_num}] Scraping: {url}")
 
-            ts_print(f"➡️  [{current_num}/{total_num}] Scraping: {url}")
+        p_id_guess = url.split("/")[-1]
+        PipelineLogger.log_event(
+            "START_SCRAPE",
+            {
+                "url": url,
+                "p4n_id_guess": p_id_guess,
+                "attempt_index": current_num,
+                "total": total_num,
+            },
+        )
 
-            p_id_guess = url.split("/")[-1]
-            PipelineLogger.log_event(
-                "START_SCRAPE",
-                {
-                    "url": url,
-                    "p4n_id_guess": p_id_guess,
-                    "attempt_index": current_num,
-                    "total": total_num,
-                },
-            )
+        page = await self._new_page()
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+            await page.wait_for_selector(".place-feedback-average", timeout=10000)
 
-            page = await context.new_page()
+            # Reviews render after the stats block; wait for them instead of
+            # sleeping a fixed 5s. Places without reviews simply time out.
             try:
-                await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                await page.wait_for_selector(".place-feedback-average", timeout=10000)
+                await page.wait_for_selector(
+                    ".place-feedback-article", state="attached", timeout=6000
+                )
+            except:
+                pass
 
-                await asyncio.sleep(5.0)
+            data = await page.evaluate(PLACE_EXTRACT_JS)
 
-                stats_container = page.locator(".place-feedback-average")
+            # DEFENSIVE FIX: Extract review count safely to avoid NoneType error
+            count_match = COUNT_RE.search(data["count_text"] or "")
+            actual_feedback_count = int(count_match.group(1)) if count_match else 0
 
-                # DEFENSIVE FIX: Extract review count safely to avoid NoneType error
-                raw_count_text = await stats_container.locator("strong").text_content()
-                count_match = re.search(r"(\d+)", raw_count_text)
-                actual_feedback_count = int(count_match.group(1)) if count_match else 0
+            if actual_feedback_count < MIN_REVIEWS_THRESHOLD:
+                ts_print(
+                    f"🗑️  [DISCARD] Low feedback ({actual_feedback_count} reviews) for: {url}"
+                )
+                self.stats["discarded_low_feedback"] += 1
+                return
 
-                if actual_feedback_count < MIN_REVIEWS_THRESHOLD:
-                    ts_print(
-                        f"🗑️  [DISCARD] Low feedback ({actual_feedback_count} reviews) for: {url}"
-                    )
-                    self.stats["discarded_low_feedback"] += 1
-                    return
+            p_id = data["place_id"] or url.split("/")[-1]
+            title = (data["title"] or "").split("\n")[0].strip()
 
-                p_id = (
-                    await page.locator("body").get_attribute("data-place-id")
-                    or url.split("/")[-1]
-                )
-                title = (
-                    (await page.locator("h1").first.text_content())
-                    .split("\n")[0]
-                    .strip()
-                )
+            lat, lng = 0.0, 0.0
+            coord_link = data["coord_href"]
+            if coord_link:
+                m = LATLNG_RE.search(coord_link)
+                if m:
+                    lat, lng = float(m.group(1)), float(m.group(2))
 
-                lat, lng = 0.0, 0.0
-                coord_link_el = page.locator("a[href*='lat='][href*='lng=']").first
-                coord_link = (
-                    await coord_link_el.get_attribute("href")
-                    if await coord_link_el.count() > 0
-                    else None
-                )
-                if coord_link:
-                    m = re.search(
-                        r"lat=([-+]?\d*\.\d+|\d+)&lng=([-+]?\d*\.\d+|\d+)", coord_link
-                    )
-                    if m:
-                        lat, lng = float(m.group(1)), float(m.group(2))
-
-                review_articles = await page.locator(".place-feedback-article").all()
-                formatted_reviews, review_seasonality = [], {}
-
-                for article in review_articles:
-                    try:
-                        date_text = await article.locator(
-                            "span.caption.text-gray"
-                        ).text_content()
-                        text_val = await article.locator(
-                            ".place-feedback-article-content"
-                        ).text_content()
-                        date_parts = date_text.strip().split("/")
-                        if len(date_parts) == 3:
-                            date_val = (
-                                f"{date_parts[2]}-{date_parts[1]}-{date_parts[0]}"
-                            )
-                            if is_review_within_years(date_val, REVIEW_YEARS):
-                                month_key = f"{date_parts[2]}-{date_parts[1]}"
-                                review_seasonality[month_key] = (
-                                    review_seasonality.get(month_key, 0) + 1
-                                )
-                                formatted_reviews.append(
-                                    f"[{date_val}]: {text_val.strip()}"
-                                )
-                    except:
-                        continue
-
-                raw_payload = {
-                    "places_count": (
-                        int(val)
-                        if (
-                            val := await self._get_dl(page, "Number of places")
-                        ).isdigit()
-                        else 0
-                    ),
-                    "parking_cost": await self._get_dl(page, "Parking cost"),
-                    "all_reviews": formatted_reviews,
-                }
-
-                review_count = len(formatted_reviews)
-                selected_model = (
-                    FLASH_MODEL if review_count > REVIEW_COUNT_THRESHOLD else LITE_MODEL
-                )
+            formatted_reviews, review_seasonality = bucket_reviews(
+                data["reviews"]
+            )
 
-                # Pass 'url' to enable immediate diagnostic logging on error
-                ai_data = await self.analyze_with_ai(raw_payload, selected_model, url)
-                top_langs = ai_data.get("top_languages", [])
-                pros_cons = ai_data.get("pros_cons") or {}
-
-                # DEFENSIVE FIX: Extract average rating safely to avoid NoneType error
-                rating_text = await stats_container.locator(".text-gray").text_content()
-                rating_match = re.search(r"(\d+\.?\d*)", rating_text)
-                avg_rating = float(rating_match.group(1)) if rating_match else 0.0
-
-                row = {
-                    "p4n_id": p_id,
-                    "title": title,
-                    "url": url,
-                    "latitude": lat,
-                    "longitude": lng,
-                    "location_type": await self._get_type(page),
-                    "num_places": ai_data.get("num_places"),
-                    "total_reviews": actual_feedback_count,
-                    "avg_rating": avg_rating,
-                    "parking_min_eur": ai_data.get("parking_min"),
-                    "parking_max_eur": ai_data.get("parking_max"),
-                    "electricity_eur": ai_data.get("electricity_eur"),
-                    "review_seasonality": json.dumps(review_seasonality),
-                    "top_languages": "; ".join(
-                        [
-                            f"{l.get('lang')} ({l.get('count')})"
-                            for l in top_langs
-                            if isinstance(l, dict)
-                        ]
-                    ),
-                    "ai_pros": "; ".join(
-                        [
-                            f"{p.get('topic')} ({p.get('count')})"
-                            for p in pros_cons.get("pros", [])
-                            if isinstance(p, dict)
-                        ]
-                    ),
-                    "ai_cons": "; ".join(
-                        [
-                            f"{c.get('topic')} ({c.get('count')})"
-                            for c in pros_cons.get("cons", [])
-                            if isinstance(c, dict)
-                        ]
-                    ),
-                    "last_scraped": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                }
-                PipelineLogger.log_event("STORED_ROW", row)
-                self.processed_batch.append(row)
-                self.stats["read"] += 1
+            raw_payload = {
+                "places_count": (
+                    int(val)
+                    if (val := self._get_dl(data["dl"], "Number of places")).isdigit()
+                    else 0
+                ),
+                "parking_cost": self._get_dl(data["dl"], "Parking cost"),
+                "all_reviews": formatted_reviews,
+            }
+
+            review_count = len(formatted_reviews)
+            selected_model = (
+                FLASH_MODEL if review_count > REVIEW_COUNT_THRESHOLD else LITE_MODEL
+            )
+
+            # DEFENSIVE FIX: Extract average rating safely to avoid NoneType error
+            rating_match = RATING_RE.search(data["rating_text"] or "")
+            avg_rating = float(rating_match.group(1)) if rating_match else 0.0
+
+            row = {
+                "p4n_id": p_id,
+                "title": title,
+                "url": url,
+                "latitude": lat,
+                "longitude": lng,
+                "location_type": data["location_type"] or "Unknown",
+                "num_places": None,
+                "total_reviews": actual_feedback_count,
+                "avg_rating": avg_rating,
+                "parking_min_eur": None,
+                "parking_max_eur": None,
+                "electricity_eur": None,
+                "review_seasonality": orjson.dumps(review_seasonality).decode(),
+                "top_languages": "",
+                "ai_pros": "",
+                "ai_cons": "",
+                "last_scraped": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            # AI fields are filled later, batched with other places' reviews
+            self.pending_ai.append(
+                {"row": row, "payload": raw_payload, "model": selected_model}
+            )
+            self.stats["read"] += 1
+        except Exception as e:
+            ts_print(f"⚠️ Error for {url}: {e}")
+        finally:
+            await self._close_page(page)
+
+    @staticmethod
+    def _get_dl(dl, label):
+        """Return the first <dd> value whose <dt> label contains `label`."""
+        label = label.lower()
+        for key, value in dl.items():
+            if label in key.lower():
+                return value
+        return "N/A"
+
+    async def _discover(self, url):
+        """Return the absolute /place/ URLs found on one search page."""
+        async with self.semaphore:
+            page = await self._new_page()
+            try:
+                await page.goto(url, wait_until="domcontentloaded")
+                try:
+                    await page.wait_for_selector("a[href*='/place/']", timeout=5000)
+                except:
+                    pass
+                return await page.eval_on_selector_all(
+                    "a[href*='/place/']", "els => els.map((a) => a.href)"
+                )
             except Exception as e:
-                ts_print(f"⚠️ Error for {url}: {e}")
+                ts_print(f"⚠️ Search page error for {url}: {e}")
+                return []
             finally:
-                await page.close()
-
-    async def _get_type(self, page):
-        try:
-            return await page.locator(".place-header-access img").get_attribute("title")
-        except:
-            return "Unknown"
+                await self._close_page(page)
+
+    def _fresh_mask(self, links):
+        """Per link, True when its place was scraped within STALENESS_DAYS.
+
+        One left merge against existing_df instead of a lookup per link;
+        unknown ids and --force always count as stale.
+        """
+        if self.force or self.existing_df.empty or not links:
+            return [False] * len(links)
+        ids = pd.DataFrame({"p4n_id": [link.split("/")[-1] for link in links]})
+        known = self.existing_df.drop_duplicates(subset=["p4n_id"])[STALENESS_COLUMNS]
+        merged = ids.merge(known, on="p4n_id", how="left")
+        # NaT compares False, so never-scraped ids stay stale.
+        stale_cutoff = pd.Timestamp.now() - pd.Timedelta(days=STALENESS_DAYS)
+        return (merged["last_scraped"] > stale_cutoff).tolist()
 
-    async def _get_dl(self, page, label):
+    @staticmethod
+    def _saved_browser_state():
+        """Path of the saved storage state, or None if missing or too old."""
         try:
-            return (
-                await page.locator(f"dt:has-text('{label}') + dd").first.text_content()
-            ).strip()
-        except:
-            return "N/A"
+            age = time.time() - os.path.getmtime(BROWSER_STATE_FILE)
+        except OSError:
+            return None
+        if age > BROWSER_STATE_MAX_AGE_DAYS * 86400:
+            return None
+        return BROWSER_STATE_FILE
+
+    async def _save_browser_state(self):
+        """Save cookies for the next run without extending the state's TTL."""
+        await self.context.storage_state(path=BROWSER_STATE_FILE)
+        # Saving bumps the mtime; put back the time the reused state was
+        # first built so BROWSER_STATE_MAX_AGE_DAYS still expires it.
+        if self._state_built_at is not None:
+            os.utime(BROWSER_STATE_FILE, (self._state_built_at, self._state_built_at))
+
+    async def _new_context(self, storage_state=None):
+        """Context with stealth and resource blocking installed."""
+        context = await self.browser.new_context(storage_state=storage_state)
+        # One init script on the context covers every page opened from it.
+        await Stealth().apply_stealth_async(context)
+        await context.route("**/*", block_heavy_resources)
+        return context
+
+    async def _new_page(self):
+        """Open a page, swapping in a fresh context every CONTEXT_ROTATE_PAGES.
+
+        Long-lived contexts with route handlers grow in memory; the new
+        context inherits cookies through storage_state.
+        """
+        async with self._context_lock:
+            if self._pages_opened >= CONTEXT_ROTATE_PAGES:
+                old = self.context
+                state = await old.storage_state()
+                self.context = await self._new_context(state)
+                self._pages_opened = 0
+                # With no page in flight, _close_page will never retire it.
+                if not old.pages:
+                    await old.close()
+            self._pages_opened += 1
+            return await self.context.new_page()
+
+    async def _close_page(self, page):
+        await page.close()
+        # A retired context is closed once its last in-flight page is done.
+        context = page.context
+        if context is not self.context and not context.pages:
+            await context.close()
 
     async def start(self):
+        PipelineLogger.start_writer()
+        # Each run owns its pooled client, so a later start() gets a live one.
+        gemini_http, self.client = pooled_gemini_client()
+        try:
+            await self._run()
+        finally:
+            await gemini_http.aclose()
+            self.client = client
+            # Drain queued events even when the run dies before scraping.
+            await PipelineLogger.stop_writer()
+
+    async def _run(self):
         async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            await Stealth().apply_stealth_async(page)
+            # Read the staleness columns off-loop while Chromium starts up.
+            self.existing_df, self.browser = await asyncio.gather(
+                asyncio.to_thread(self._load_existing),
+                p.chromium.connect_over_cdp(BROWSER_CDP_URL)
+                if BROWSER_CDP_URL
+                else p.chromium.launch(headless=True, args=BROWSER_ARGS),
+            )
+            # Reuse cookies (consent banner, session) from the previous run.
+            saved_state = self._saved_browser_state()
+            if saved_state:
+                self._state_built_at = os.path.getmtime(saved_state)
+            self.context = await self._new_context(saved_state)
 
             if self.single_url:
                 target_urls = [self.single_url]
@@ -473,8 +1060,9 @@ class P4NScraper:
                 target_urls = [self.search_url]
                 current_idx, total_idx = 1, 1
             else:
-                target_urls, current_idx, total_idx = (
-                    DailyQueueManager.get_next_partition(self.batch_size)
+                # File I/O stays off the event loop (the writer task is live).
+                target_urls, current_idx, total_idx = await asyncio.to_thread(
+                    DailyQueueManager.get_next_partition, self.batch_size
                 )
 
             ts_print("=" * 60)
@@ -487,59 +1075,33 @@ class P4NScraper:
             if self.single_url:
                 discovered = [self.single_url]
             else:
-                discovery_links = []
-                for url in target_urls:
-                    await page.goto(url, wait_until="domcontentloaded")
-                    try:
-                        await page.wait_for_selector("a[href*='/place/']", timeout=5000)
-                    except:
-                        pass
-                    links = await page.locator("a[href*='/place/']").all()
-                    for link in links:
-                        href = await link.get_attribute("href")
-                        if href:
-                            discovery_links.append(
-                                f"https://park4night.com{href}"
-                                if href.startswith("/")
-                                else href
-                            )
-
-                discovered = list(set(discovery_links))
+                # Search pages are fetched concurrently, one page each.
+                results = await asyncio.gather(
+                    *(self._discover(url) for url in target_urls)
+                )
+                discovered = list({href for hrefs in results for href in hrefs if href})
 
             if self.is_dev:
                 ts_print(f"🛠️  [DEV MODE] Seeking {DEV_LIMIT} successful run(s)...")
 
+            fresh_mask = self._fresh_mask(discovered)
+
             tasks = []
-            for link in discovered:
+            for link, is_fresh in zip(discovered, fresh_mask):
                 if self.is_dev and self.stats["read"] >= DEV_LIMIT:
                     break
 
-                p_id = link.split("/")[-1]
-                is_stale = True
-                if (
-                    not self.force
-                    and not self.existing_df.empty
-                    and str(p_id) in self.existing_df["p4n_id"].astype(str).values
-                ):
-                    last_date = self.existing_df[
-                        self.existing_df["p4n_id"].astype(str) == str(p_id)
-                    ]["last_scraped"].iloc[0]
-                    if pd.notnull(last_date) and (
-                        datetime.now() - pd.to_datetime(last_date)
-                    ) < timedelta(days=STALENESS_DAYS):
-                        is_stale = False
-
-                if is_stale or self.force:
+                if not is_fresh:
                     if self.is_dev:
                         await self.extract_atomic(
-                            context, link, self.stats["read"] + 1, "Seeking..."
+                            link, self.stats["read"] + 1, "Seeking..."
                         )
                         if self.stats["read"] >= DEV_LIMIT:
                             break
                     else:
                         tasks.append(
                             self.extract_atomic(
-                                context, link, len(tasks) + 1, len(discovered)
+                                link, len(tasks) + 1, len(discovered)
                             )
                         )
                 else:
@@ -547,18 +1109,39 @@ class P4NScraper:
                     self.stats["discarded_fresh"] += 1
             try:
                 if tasks:
-                    await asyncio.gather(*tasks)
+                    async with asyncio.TaskGroup() as tg:
+                        for task in tasks:
+                            tg.create_task(task)
             except Exception as e:
                 ts_print(f"⚠️ Unhandled error during scraping: {e}")
                 PipelineLogger.log_event("RUN_ERROR", {"error": str(e)})
+                PipelineLogger.flush()
             finally:
                 try:
-                    await browser.close()
+                    await self._save_browser_state()
+                except Exception:
+                    pass
+                try:
+                    # A shared browser outlives this run; only drop our context.
+                    if BROWSER_CDP_URL:
+                        await self.context.close()
+                    else:
+                        await self.browser.close()
                 except Exception:
                     pass
 
                 try:
-                    self._upsert_and_save()
+                    # Let in-flight batches land before tagging the remainder.
+                    await asyncio.gather(*self._ai_tasks)
+                    await self._analyze_pending()
+                except Exception as e2:
+                    ts_print(f"⚠️ Error during AI analysis: {e2}")
+                    PipelineLogger.log_event("AI_ERROR", {"error": str(e2)})
+                if self._ai_cache is not None:
+                    self._ai_cache.close()
+
+                try:
+                    await self._flush_batch()
                 except Exception as e2:
                     ts_print(f"⚠️ Error saving processed batch: {e2}")
                     PipelineLogger.log_event("SAVE_ERROR", {"error": str(e2)})
@@ -577,83 +1160,123 @@ class P4NScraper:
                 f"🤖 Total Gemini Flash-Lite Calls: {self.stats.get('gemini_lite_calls', 0)}"
             )
             ts_print(f"❌ Total Gemini Errors: {self.stats.get('gemini_errors', 0)}")
+            ts_print(
+                f"💾 Reviews Answered From Cache: {self.stats.get('gemini_cache_hits', 0)}"
+            )
             ts_print("=" * 40)
 
             if not self.is_dev and not self.single_url and not self.search_url:
-                DailyQueueManager.increment_state(self.batch_size)
-
-    def _upsert_and_save(self):
-        if not self.processed_batch:
-            return
-
-        try:
-            new_df = pd.DataFrame(self.processed_batch)
-
-            if "p4n_id" in new_df.columns:
-                new_df["p4n_id"] = (
-                    new_df["p4n_id"].astype(str).str.strip().replace("nan", "")
-                )
-            else:
-                new_df["p4n_id"] = ""
-
-            if "last_scraped" in new_df.columns:
-                new_df["last_scraped"] = pd.to_datetime(
-                    new_df["last_scraped"], errors="coerce"
+                await asyncio.to_thread(
+                    DailyQueueManager.increment_state, self.batch_size
                 )
-            else:
-                new_df["last_scraped"] = pd.NaT
 
-            new_df = new_df[new_df["p4n_id"].astype(bool)].copy()
+    async def _flush_batch(self):
+        """Persist the rows scraped so far so a later crash cannot lose them.
 
-            existing = (
-                self.existing_df.copy()
-                if not self.existing_df.empty
-                else pd.DataFrame()
+        The CSV work runs in a thread so pages keep loading meanwhile.
+        """
+        async with self._save_lock:
+            batch, self.processed_batch = self.processed_batch, []
+            if not batch:
+                return
+            await asyncio.to_thread(self._upsert_and_save, batch)
+            # The store now holds these ids; record them without re-reading it.
+            saved = self._batch_frame(batch)[STALENESS_COLUMNS]
+            frames = [saved] if self.existing_df.empty else [saved, self.existing_df]
+            self.existing_df = pd.concat(frames, ignore_index=True).drop_duplicates(
+                subset=["p4n_id"], keep="first"
             )
 
-            if not existing.empty:
-                if "p4n_id" in existing.columns:
-                    existing["p4n_id"] = (
-                        existing["p4n_id"].astype(str).str.strip().replace("nan", "")
-                    )
-                else:
-                    existing["p4n_id"] = ""
+    def _append_new_rows(self, new_df):
+        """Append rows to the CSV when none of their ids exist there yet.
+
+        Returns False when a full upsert is needed instead (missing file,
+        unknown columns or an id that must replace an existing row).
+        """
+        if not os.path.exists(self.csv_file) or self.existing_df.empty:
+            return False
+
+        header = pd.read_csv(self.csv_file, nrows=0).columns
+        existing_ids = set(self.existing_df["p4n_id"].astype(str).str.strip())
+        if not set(new_df.columns) <= set(header) or new_df["p4n_id"].isin(existing_ids).any():
+            return False
+
+        new_df.drop_duplicates(subset=["p4n_id"], keep="first").reindex(
+            columns=header
+        ).to_csv(
+            self.csv_file,
+            mode="a",
+            index=False,
+            header=False,
+            date_format="%Y-%m-%d %H:%M:%S",
+        )
+        return True
 
-                if "last_scraped" in existing.columns:
-                    existing["last_scraped"] = pd.to_datetime(
-                        existing["last_scraped"], errors="coerce"
-                    )
-                else:
-                    existing["last_scraped"] = pd.NaT
+    @staticmethod
+    def _batch_frame(rows):
+        """Scraped rows as a frame with normalized ids and parsed dates."""
+        new_df = pd.DataFrame(rows)
 
-                existing = existing[existing["p4n_id"].astype(bool)].copy()
+        if "p4n_id" in new_df.columns:
+            new_df["p4n_id"] = (
+                new_df["p4n_id"].astype(str).str.strip().replace("nan", "")
+            )
+        else:
+            new_df["p4n_id"] = ""
 
-            if not new_df.empty:
-                new_df["_is_new"] = True
-            if not existing.empty:
-                existing["_is_new"] = False
+        if "last_scraped" in new_df.columns:
+            new_df["last_scraped"] = pd.to_datetime(
+                new_df["last_scraped"], errors="coerce"
+            )
+        else:
+            new_df["last_scraped"] = pd.NaT
 
-            final_df = pd.concat([new_df, existing], ignore_index=True, sort=False)
+        return new_df[new_df["p4n_id"].astype(bool)].copy()
 
-            if "last_scraped" in final_df.columns:
-                final_df["last_scraped"] = pd.to_datetime(
-                    final_df["last_scraped"], errors="coerce"
-                )
+    def _upsert_and_save(self, rows=None):
+        rows = self.processed_batch if rows is None else rows
+        if not rows:
+            return
 
-            if "p4n_id" in final_df.columns:
-                final_df = final_df.drop_duplicates(subset=["p4n_id"], keep="first")
+        try:
+            new_df = self._batch_frame(rows)
 
-            if "_is_new" in final_df.columns:
-                final_df = final_df.drop(columns=["_is_new"])
+            if self._append_new_rows(new_df):
+                return
 
-            final_df.to_csv(self.csv_file, index=False)
+            # _read_store has already normalized p4n_id and last_scraped, so
+            # both frames share datetime dtypes and nothing is re-parsed. A
+            # failed read raises into the append fallback below rather than
+            # rewriting the store with only this batch.
+            existing = (
+                self._read_store()
+                if os.path.exists(self.csv_file)
+                else pd.DataFrame(columns=["p4n_id"])
+            ).drop_duplicates(subset=["p4n_id"], keep="first")
+            new_df = new_df.drop_duplicates(subset=["p4n_id"], keep="first")
+
+            # Anti-join: keep the stored rows this batch does not replace.
+            kept = existing[~existing["p4n_id"].isin(new_df["p4n_id"])]
+            final_df = pd.concat([kept, new_df], ignore_index=True, sort=False)
+            # Put every id back at its stored position, unseen ids last, so a
+            # --force run updates rows in place instead of reshuffling the
+            # committed file. A hash reindex, not a sort.
+            order = pd.Index(existing["p4n_id"]).append(pd.Index(new_df["p4n_id"]))
+            columns = final_df.columns
+            final_df = (
+                final_df.set_index("p4n_id").reindex(order.unique()).reset_index()
+            )[columns]
+
+            final_df.to_csv(
+                self.csv_file, index=False, date_format="%Y-%m-%d %H:%M:%S"
+            )
 
         except Exception as e:
             PipelineLogger.log_event("UPSERT_SAVE_ERROR", {"error": str(e)})
             ts_print(f"⚠️ Saving error: {e}. Attempting fallback append to CSV.")
 
             try:
-                fallback_df = pd.DataFrame(self.processed_batch)
+                fallback_df = pd.DataFrame(rows)
                 if "last_scraped" in fallback_df.columns:
                     fallback_df["last_scraped"] = fallback_df["last_scraped"].astype(
                         str
@@ -4,6 +4,7 @@ import os
 import asyncio
 import re
 import sys
+import orjson
 from typing import List, Dict, Set
 from google import genai
 from google.genai import types
@@ -12,6 +13,7 @@ from google.genai import types
 API_KEY = os.environ.get("GOOGLE_API_KEY")
 EVAL_SET_FILE = "eval_set.json"
 PROMPT_FILE = "llm_prompt.txt"
+FENCE_RE = re.compile(r"```(?:json)?\s*", re.IGNORECASE)
 
 # Model Options
 MODELS = {
@@ -55,9 +57,7 @@ def calculate_metrics(gold_set: Set[str], pred_set: Set[str]):
     return len(gold_set.intersection(pred_set)), len(fp_set), len(fn_set), fp_set, fn_set
 
 def extract_json_content(text):
-    text = re.sub(r"```json\s*", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"```\s*", "", text)
-    return text.strip()
+    return FENCE_RE.sub("", text).strip()
 
 async def process_batch(client, model_name, system_instruction, batch_reviews, start_index):
     config = types.GenerateContentConfig(
@@ -69,15 +69,15 @@ async def process_batch(client, model_name, system_instruction, batch_reviews, s
     try:
         response = await client.aio.models.generate_content(
             model=model_name,
-            contents=f"ANALYZE REVIEWS:\n{json.dumps(batch_reviews)}",
+            contents=f"ANALYZE REVIEWS:\n{orjson.dumps(batch_reviews).decode()}",
             config=config,
         )
         
         raw_text = extract_json_content(response.text)
         
         try:
-            parsed = json.loads(raw_text)
-        except json.JSONDecodeError:
+            parsed = orjson.loads(raw_text)
+        except orjson.JSONDecodeError:
             print(f"   ⚠️ JSON Decode Error in batch {start_index}. Response preview: {raw_text[:100]}...")
             return None 
 
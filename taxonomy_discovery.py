@@ -2,6 +2,7 @@ import asyncio
 import json
 import os
 import re
+import orjson
 import pandas as pd
 from datetime import datetime
 from google import genai
@@ -15,6 +16,13 @@ URL_LIST_FILE = "url_list.txt"
 TAXONOMY_FILE = "taxonomy.json"  # New source of truth
 OUTPUT_FILE = "taxonomy_discovery_report.json"
 BATCH_SIZE = 5 
+MAX_REVIEWS = 20  # Reviews read per property for the audit
+BLOCKED_RESOURCE_TYPES = frozenset(
+    {"image", "font", "media", "stylesheet", "texttrack", "manifest"}
+)
+BLOCKED_HOSTS_RE = re.compile(
+    r"doubleclick|googletagmanager|analytics|facebook\.net|hotjar"
+)
 
 GEMINI_API_KEY = os.environ.get("GOOGLE_API_KEY")
 client = genai.Client(api_key=GEMINI_API_KEY)
@@ -22,6 +30,16 @@ client = genai.Client(api_key=GEMINI_API_KEY)
 def ts_print(msg):
     print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
 
+async def block_heavy_resources(route):
+    """Abort assets and trackers; discovery only reads the DOM."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_HOSTS_RE.search(
+        request.url
+    ):
+        await route.abort()
+    else:
+        await route.continue_()
+
 def load_current_taxonomy():
     """Reads the current taxonomy from the JSON file and formats it with descriptions for the AI."""
     if os.path.exists(TAXONOMY_FILE):
@@ -56,16 +74,39 @@ class TaxonomyDiscoverer:
             await page.goto(url, wait_until="domcontentloaded", timeout=30000)
             await page.wait_for_selector(".place-feedback-article", timeout=10000)
             
-            elements = await page.locator(".place-feedback-article-content").all()
-            for el in elements[:20]:
-                text = await el.text_content()
-                if text: reviews.append(text.strip())
+            # One round-trip for the first reviews instead of one per element
+            texts = await page.eval_on_selector_all(
+                ".place-feedback-article-content",
+                "(els, n) => els.slice(0, n).map((el) => el.textContent)",
+                MAX_REVIEWS,
+            )
+            reviews = [text.strip() for text in texts if text and text.strip()]
         except Exception as e:
             ts_print(f"⚠️ Could not find reviews on {url}")
         finally:
             await page.close()
         return {"url": url, "reviews": reviews}
 
+    async def discover_links(self, context, url):
+        ts_print(f"🔍 [SEARCH PAGE] Finding properties on: {url}")
+        page = await context.new_page()
+        try:
+            await page.goto(url, wait_until="domcontentloaded")
+            try:
+                await page.wait_for_selector("a[href*='/place/']", timeout=5000)
+            except:
+                ts_print(f"⚠️ No place links found on {url}")
+
+            # One round-trip for every href on the page
+            return await page.locator("a[href*='/place/']").evaluate_all(
+                "els => els.map((a) => a.href)"
+            )
+        except Exception as e:
+            ts_print(f"⚠️ Search page error for {url}: {e}")
+            return []
+        finally:
+            await page.close()
+
     async def analyze_batch(self, batch_data):
         valid_data = [d for d in batch_data if d['reviews']]
         if not valid_data:
@@ -102,12 +143,12 @@ class TaxonomyDiscoverer:
 
         response = await client.aio.models.generate_content(
             model=DISCOVERY_MODEL,
-            contents=f"NEW DATA TO ANALYZE:\n{json.dumps(valid_data)}",
+            contents=f"NEW DATA TO ANALYZE:\n{orjson.dumps(valid_data).decode()}",
             config=config,
         )
         
         try:
-            return json.loads(response.text)
+            return orjson.loads(response.text)
         except:
             ts_print("❌ Failed to parse AI JSON")
             return {"new_suggestions": []}
@@ -124,34 +165,13 @@ class TaxonomyDiscoverer:
             browser = await p.chromium.launch(headless=True)
             context = await browser.new_context()
             await Stealth().apply_stealth_async(context)
+            await context.route("**/*", block_heavy_resources)
             
-            discovery_links = []
-            page = await context.new_page()
-            
-            for url in search_urls:
-                ts_print(f"🔍 [SEARCH PAGE] Finding properties on: {url}")
-                try:
-                    await page.goto(url, wait_until="domcontentloaded")
-                    try:
-                        await page.wait_for_selector("a[href*='/place/']", timeout=5000)
-                    except:
-                        ts_print(f"⚠️ No place links found on {url}")
-                        pass
-                    
-                    links = await page.locator("a[href*='/place/']").all()
-                    for link in links:
-                        href = await link.get_attribute("href")
-                        if href:
-                            discovery_links.append(
-                                f"https://park4night.com{href}"
-                                if href.startswith("/")
-                                else href
-                            )
-                except Exception as e:
-                    ts_print(f"⚠️ Search page error for {url}: {e}")
-
-            discovered = list(set(discovery_links))
-            await page.close()
+            # Search pages are independent, so they load concurrently.
+            results = await asyncio.gather(
+                *(self.discover_links(context, url) for url in search_urls)
+            )
+            discovered = list({href for hrefs in results for href in hrefs if href})
 
             if not discovered:
                 ts_print("❌ Still found 0 properties. Please check if search pages are active.")
@@ -0,0 +1,555 @@
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import orjson
+import pandas as pd
+import pytest
+
+import backbone_crawler
+from backbone_crawler import (
+    AsyncRateLimiter,
+    FLASH_MODEL,
+    DailyQueueManager,
+    P4NScraper,
+    PipelineLogger,
+    bucket_reviews,
+    parse_ai_response,
+    retry_delay,
+)
+
+
+def test_parse_ai_response_strips_code_fence():
+    text = '```json\n[{"id": 0, "pros": ["a"], "cons": []}]\n```'
+    assert parse_ai_response(text) == [{"id": 0, "pros": ["a"], "cons": []}]
+
+
+def test_parse_ai_response_unwraps_nested_list():
+    text = '{"results": [{"id": 0, "pros": [], "cons": ["b"]}]}'
+    assert parse_ai_response(text) == [{"id": 0, "pros": [], "cons": ["b"]}]
+
+
+def test_parse_ai_response_rejects_invalid_json():
+    with pytest.raises(orjson.JSONDecodeError):
+        parse_ai_response("not json")
+
+
+def test_bucket_reviews_filters_old_and_invalid_dates():
+    recent = pd.Timestamp.now() - pd.Timedelta(days=10)
+    rows = [
+        (recent.strftime("%d/%m/%Y"), "  great spot "),
+        ("01/01/2001", "too old"),
+        ("not a date", "garbage"),
+        (None, "no date"),
+    ]
+    formatted, seasonality = bucket_reviews(rows)
+    assert formatted == [f"[{recent:%Y-%m-%d}]: great spot"]
+    assert seasonality == {recent.strftime("%Y-%m"): 1}
+
+
+def test_bucket_reviews_cleans_texts_but_counts_all():
+    day = (pd.Timestamp.now() - pd.Timedelta(days=3)).strftime("%d/%m/%Y")
+    rows = [
+        (day, "Nice   quiet\n\nspot by the lake"),
+        (day, "Nice quiet spot by the lake"),
+        (day, "Top!"),
+        (day, "x" * 1000),
+    ]
+    formatted, seasonality = bucket_reviews(rows)
+    texts = [f.split("]: ", 1)[1] for f in formatted]
+    assert texts == ["Nice quiet spot by the lake", "x" * backbone_crawler.REVIEW_MAX_CHARS]
+    assert sum(seasonality.values()) == 4
+
+
+def test_pipeline_logger_writes_ndjson(tmp_path, monkeypatch):
+    log_file = tmp_path / "pipeline.log"
+    monkeypatch.setattr(backbone_crawler, "LOG_FILE", str(log_file))
+    PipelineLogger.close()
+
+    PipelineLogger.log_event("FIRST", {"payload": '{"a": 1}', "n": 2})
+    PipelineLogger.log_event("SECOND", {"text": "plain"})
+    PipelineLogger.close()
+
+    entries = [orjson.loads(line) for line in log_file.read_bytes().splitlines()]
+    assert [e["type"] for e in entries] == ["FIRST", "SECOND"]
+    assert entries[0]["content"] == {"payload": '{"a": 1}', "n": 2}
+
+
+class FakeModels:
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = []
+
+    async def generate_content(self, model, contents, config):
+        self.calls.append(contents)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return SimpleNamespace(text=answer)
+
+
+def fake_client(answers):
+    return SimpleNamespace(aio=SimpleNamespace(models=FakeModels(answers)))
+
+
+def test_analyze_with_ai_aggregates_chunks(monkeypatch):
+    monkeypatch.setattr(backbone_crawler, "MAX_REVIEWS_PER_CALL", 2)
+    monkeypatch.setattr(backbone_crawler, "_load_generate_config", lambda: None)
+    fake = fake_client(
+        [
+            '[{"id": 0, "pros": ["quiet"], "cons": []}, {"id": 1, "pros": ["quiet"], "cons": ["dirty"]}]',
+            '```json\n[{"id": 0, "pros": [], "cons": ["dirty"]}]\n```',
+        ]
+    )
+    monkeypatch.setattr(backbone_crawler, "client", fake)
+
+    scraper = P4NScraper(is_dev=True)
+    raw = {"places_count": 12, "all_reviews": ["a", "b", "c"]}
+    result = asyncio.run(scraper.analyze_with_ai(raw, FLASH_MODEL, "url"))
+
+    assert result["num_places"] == 12
+    assert result["pros_cons"]["pros"] == [{"topic": "quiet", "count": 2}]
+    assert result["pros_cons"]["cons"] == [{"topic": "dirty", "count": 2}]
+    assert len(fake.aio.models.calls) == 2
+
+
+def test_analyze_batch_routes_answers_by_id(monkeypatch):
+    monkeypatch.setattr(backbone_crawler, "MAX_REVIEWS_PER_CALL", 3)
+    monkeypatch.setattr(backbone_crawler, "_load_generate_config", lambda: None)
+    fake = fake_client(
+        [
+            # Out of order on purpose: ids 0-1 belong to place A, id 2 to B
+            '[{"id": 2, "pros": ["view"], "cons": []}, {"id": 0, "pros": ["quiet"], "cons": []},'
+            ' {"id": 1, "pros": [], "cons": ["noisy"]}]',
+            '[{"id": 0, "pros": ["view"], "cons": []}]',
+        ]
+    )
+    monkeypatch.setattr(backbone_crawler, "client", fake)
+
+    scraper = P4NScraper(is_dev=True)
+    payloads = [
+        ({"places_count": 5, "all_reviews": ["a", "b"]}, "url-a"),
+        ({"places_count": 9, "all_reviews": ["c", "d"]}, "url-b"),
+        ({"places_count": 1, "all_reviews": []}, "url-c"),
+    ]
+    a, b, c = asyncio.run(scraper.analyze_batch_with_ai(payloads, FLASH_MODEL))
+
+    assert a["pros_cons"] == {
+        "pros": [{"topic": "quiet", "count": 1}],
+        "cons": [{"topic": "noisy", "count": 1}],
+    }
+    assert b["num_places"] == 9
+    assert b["pros_cons"]["pros"] == [{"topic": "view", "count": 2}]
+    assert c == {}
+    assert len(fake.aio.models.calls) == 2
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+    async def close(self):
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self, storage_state):
+        self.storage = storage_state
+        self.pages = []
+        self.closed = False
+
+    async def add_init_script(self, script):
+        pass
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def storage_state(self, path=None):
+        if path:
+            with open(path, "w") as f:
+                f.write('{"cookies": ["consent"]}')
+        return {"cookies": ["consent"]}
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    async def new_context(self, storage_state=None):
+        return FakeContext(storage_state)
+
+
+def test_context_rotates_and_retires_after_last_page(monkeypatch):
+    monkeypatch.setattr(backbone_crawler, "CONTEXT_ROTATE_PAGES", 2)
+
+    async def run():
+        scraper = P4NScraper(is_dev=True)
+        scraper.browser = FakeBrowser()
+        scraper.context = await scraper._new_context()
+        first = scraper.context
+        p1, p2 = await scraper._new_page(), await scraper._new_page()
+        p3 = await scraper._new_page()
+        second = scraper.context
+
+        assert p3.context is second is not first
+        assert second.storage == {"cookies": ["consent"]}
+        await scraper._close_page(p1)
+        assert not first.closed
+        await scraper._close_page(p2)
+        assert first.closed
+        await scraper._close_page(p3)
+        assert not second.closed
+
+    asyncio.run(run())
+
+
+def test_idle_context_is_closed_on_rotation(monkeypatch):
+    monkeypatch.setattr(backbone_crawler, "CONTEXT_ROTATE_PAGES", 2)
+
+    async def run():
+        scraper = P4NScraper(is_dev=True)
+        scraper.browser = FakeBrowser()
+        scraper.context = await scraper._new_context()
+        first = scraper.context
+        # Sequential use: every page is closed before the next one opens.
+        for _ in range(2):
+            await scraper._close_page(await scraper._new_page())
+        assert not first.closed
+
+        page = await scraper._new_page()
+        assert first.closed and page.context is scraper.context is not first
+
+    asyncio.run(run())
+
+
+def test_extract_atomic_tags_batches_in_background(monkeypatch):
+    monkeypatch.setattr(backbone_crawler, "SAVE_EVERY", 2)
+    scraper = P4NScraper(is_dev=True)
+
+    async def fake_scrape(url, current_num, total_num):
+        scraper.pending_ai.append({"row": {"url": url}})
+
+    async def run():
+        release = asyncio.Event()
+        tagged = []
+
+        async def slow_analyze():
+            batch, scraper.pending_ai = scraper.pending_ai, []
+            await release.wait()
+            tagged.extend(entry["row"]["url"] for entry in batch)
+
+        scraper._scrape_place = fake_scrape
+        scraper._analyze_pending = slow_analyze
+        await scraper.extract_atomic("a", 1, 3)
+        await scraper.extract_atomic("b", 2, 3)
+        # Tagging is still blocked, yet the next place scrapes straight away.
+        await scraper.extract_atomic("c", 3, 3)
+        assert tagged == [] and len(scraper._ai_tasks) == 1
+
+        release.set()
+        await asyncio.gather(*scraper._ai_tasks)
+        return tagged
+
+    assert asyncio.run(run()) == ["a", "b"]
+
+
+def test_analyze_batch_reuses_cached_review_answers(tmp_path, monkeypatch):
+    monkeypatch.setattr(backbone_crawler, "AI_CACHE_FILE", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(backbone_crawler, "_load_generate_config", lambda: None)
+    fake = fake_client(
+        [
+            '[{"id": 0, "pros": ["quiet"], "cons": []}, {"id": 1, "pros": [], "cons": ["dirty"]}]',
+            '[{"id": 0, "pros": ["view"], "cons": []}]',
+        ]
+    )
+    monkeypatch.setattr(backbone_crawler, "client", fake)
+
+    scraper = P4NScraper(is_dev=False)
+    first = asyncio.run(
+        scraper.analyze_with_ai({"all_reviews": ["a", "b"]}, FLASH_MODEL, "url-1")
+    )
+    # "a" is answered from the cache; only "c" reaches Gemini.
+    second = asyncio.run(
+        scraper.analyze_with_ai({"all_reviews": ["a", "c"]}, FLASH_MODEL, "url-2")
+    )
+    scraper._ai_cache.close()
+
+    assert first["pros_cons"]["cons"] == [{"topic": "dirty", "count": 1}]
+    assert second["pros_cons"]["pros"] == [
+        {"topic": "quiet", "count": 1},
+        {"topic": "view", "count": 1},
+    ]
+    assert fake.aio.models.calls[1] == 'ANALYZE REVIEWS:\n["c"]'
+    assert scraper.stats["gemini_cache_hits"] == 1
+
+
+class FailingCache:
+    def __init__(self, fail_on):
+        self.fail_on = fail_on
+
+    def get_many(self, keys):
+        if self.fail_on == "get":
+            raise backbone_crawler.sqlite3.OperationalError("database is locked")
+        return {}
+
+    def put_many(self, items):
+        if self.fail_on == "put":
+            raise backbone_crawler.sqlite3.DatabaseError("file is not a database")
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("fail_on", ["get", "put"])
+def test_failing_review_cache_never_loses_rows(monkeypatch, fail_on):
+    monkeypatch.setattr(backbone_crawler, "_load_generate_config", lambda: None)
+    fake = fake_client(['[{"id": 0, "pros": ["quiet"], "cons": []}]'] * 2)
+    monkeypatch.setattr(backbone_crawler, "client", fake)
+
+    scraper = P4NScraper(is_dev=False)
+    scraper._ai_cache = FailingCache(fail_on)
+    scraper.pending_ai = [
+        {"row": {"url": "url-1"}, "payload": {"all_reviews": ["a"]}, "model": FLASH_MODEL}
+    ]
+    asyncio.run(scraper._analyze_pending())
+
+    # Tagged and stored despite the cache; later batches skip the cache.
+    assert [row["ai_pros"] for row in scraper.processed_batch] == ["quiet (1)"]
+    assert scraper._get_ai_cache() is None
+
+
+def test_failed_ai_batch_still_stores_scraped_rows(monkeypatch):
+    scraper = P4NScraper(is_dev=True)
+
+    async def broken_batch(payloads, model_name):
+        raise RuntimeError("gemini down")
+
+    scraper.analyze_batch_with_ai = broken_batch
+    scraper.pending_ai = [
+        {"row": {"url": f"url-{i}", "latitude": 1.0}, "payload": {}, "model": FLASH_MODEL}
+        for i in range(2)
+    ]
+    asyncio.run(scraper._analyze_pending())
+
+    assert scraper.pending_ai == []
+    assert [row["url"] for row in scraper.processed_batch] == ["url-0", "url-1"]
+    assert all(row["ai_pros"] == "" and row["latitude"] == 1.0 for row in scraper.processed_batch)
+
+
+def test_fresh_mask_skips_only_recent_ids():
+    now = pd.Timestamp.now()
+    scraper = P4NScraper(is_dev=True)
+    scraper.existing_df = pd.DataFrame(
+        {
+            "p4n_id": ["1", "2", "3"],
+            "last_scraped": [now - pd.Timedelta(days=1), now - pd.Timedelta(days=400), pd.NaT],
+        }
+    )
+    links = [f"https://park4night.com/en/place/{i}" for i in ("1", "2", "3", "4")]
+    assert scraper._fresh_mask(links) == [True, False, False, False]
+
+    scraper.force = True
+    assert scraper._fresh_mask(links) == [False] * 4
+
+
+def test_saved_browser_state_expires(tmp_path, monkeypatch):
+    state_file = tmp_path / "state.json"
+    monkeypatch.setattr(backbone_crawler, "BROWSER_STATE_FILE", str(state_file))
+    assert P4NScraper._saved_browser_state() is None
+
+    state_file.write_text("{}")
+    assert P4NScraper._saved_browser_state() == str(state_file)
+
+    old = time.time() - (backbone_crawler.BROWSER_STATE_MAX_AGE_DAYS + 1) * 86400
+    os.utime(state_file, (old, old))
+    assert P4NScraper._saved_browser_state() is None
+
+
+def test_saved_browser_state_keeps_age_across_saves(tmp_path, monkeypatch):
+    state_file = tmp_path / "state.json"
+    monkeypatch.setattr(backbone_crawler, "BROWSER_STATE_FILE", str(state_file))
+    state_file.write_text("{}")
+    built = time.time() - (backbone_crawler.BROWSER_STATE_MAX_AGE_DAYS - 1) * 86400
+    os.utime(state_file, (built, built))
+
+    scraper = P4NScraper(is_dev=True)
+    scraper.context = FakeContext(None)
+    scraper._state_built_at = os.path.getmtime(P4NScraper._saved_browser_state())
+    asyncio.run(scraper._save_browser_state())
+
+    # Rewritten with fresh cookies, yet still aged from when it was built...
+    assert "consent" in state_file.read_text()
+    assert os.path.getmtime(state_file) == built
+    # ...so it expires on schedule even when every daily run saves it.
+    later = time.time() + 2 * 86400
+    monkeypatch.setattr(backbone_crawler.time, "time", lambda: later)
+    assert P4NScraper._saved_browser_state() is None
+
+
+def test_rate_limiter_allows_burst_then_waits():
+    async def run():
+        limiter = AsyncRateLimiter(2, period=0.2)
+        start = time.monotonic()
+        stamps = []
+        for _ in range(3):
+            async with limiter:
+                stamps.append(time.monotonic() - start)
+        return stamps
+
+    first, second, third = asyncio.run(run())
+    assert second < 0.05
+    assert third >= 0.09
+
+
+def test_retry_delay_honours_server_hint(monkeypatch):
+    monkeypatch.setattr(backbone_crawler.random, "uniform", lambda a, b: 1.0)
+    quota = "429 resource_exhausted. {'@type': 'RetryInfo', 'retryDelay': '37s'}"
+
+    assert retry_delay(1, quota.lower()) == 37.0
+    assert retry_delay(2, "please retry in 2.5s.") == 2.5
+    assert retry_delay(3, "503 overloaded") == backbone_crawler.AI_DELAY * 4
+
+
+def test_daily_queue_wraps_and_advances(tmp_path, monkeypatch):
+    url_list = tmp_path / "urls.txt"
+    url_list.write_text("a\n\nb\nc\n")
+    state_file = tmp_path / "state.json"
+    monkeypatch.setattr(backbone_crawler, "URL_LIST_FILE", str(url_list))
+    monkeypatch.setattr(backbone_crawler, "STATE_FILE", str(state_file))
+
+    assert DailyQueueManager.get_next_partition(2) == (["a", "b"], 1, 3)
+    DailyQueueManager.increment_state(2)
+    assert DailyQueueManager.get_next_partition(2) == (["c", "a"], 3, 3)
+    DailyQueueManager.increment_state(2)
+    assert orjson.loads(state_file.read_bytes()) == {"current_index": 1}
+    assert not (tmp_path / "state.json.tmp").exists()
+
+
+def test_daily_queue_repairs_invalid_cursor(tmp_path, monkeypatch, capsys):
+    url_list = tmp_path / "urls.txt"
+    url_list.write_text("a\nb\nc\n")
+    state_file = tmp_path / "state.json"
+    monkeypatch.setattr(backbone_crawler, "URL_LIST_FILE", str(url_list))
+    monkeypatch.setattr(backbone_crawler, "STATE_FILE", str(state_file))
+
+    cases = {
+        b'{"current_index": -4}': "-4",
+        b'{"current_index": "2"}': "'2'",
+        b"[1]": "[1]",
+        b"{broken": "Unreadable",
+    }
+    for bad, named in cases.items():
+        state_file.write_bytes(bad)
+        assert DailyQueueManager.get_next_partition(1) == (["a"], 1, 3)
+        # The repair is announced, naming what was wrong.
+        warning = capsys.readouterr().out
+        assert named in warning and "restarting from 0" in warning
+
+    DailyQueueManager.increment_state(2)
+    assert orjson.loads(state_file.read_bytes()) == {"current_index": 2}
+
+
+def test_pipeline_logger_background_writer(tmp_path, monkeypatch):
+    log_file = tmp_path / "pipeline_async.log"
+    monkeypatch.setattr(backbone_crawler, "LOG_FILE", str(log_file))
+    PipelineLogger.close()
+
+    async def run():
+        PipelineLogger.start_writer()
+        for i in range(120):
+            PipelineLogger.log_event("EVENT", {"i": i})
+        await PipelineLogger.stop_writer()
+        PipelineLogger.log_event("AFTER", {})
+
+    asyncio.run(run())
+    PipelineLogger.close()
+
+    entries = [orjson.loads(line) for line in log_file.read_bytes().splitlines()]
+    assert [e["content"].get("i") for e in entries[:120]] == list(range(120))
+    assert entries[-1]["type"] == "AFTER"
+
+
+def test_pipeline_logger_flushes_when_idle(tmp_path, monkeypatch):
+    log_file = tmp_path / "pipeline_idle.log"
+    monkeypatch.setattr(backbone_crawler, "LOG_FILE", str(log_file))
+    monkeypatch.setattr(backbone_crawler, "LOG_FLUSH_SECONDS", 0.01)
+    PipelineLogger.close()
+
+    async def run():
+        PipelineLogger.start_writer()
+        PipelineLogger.log_event("EVENT", {"i": 0})
+        await asyncio.sleep(0.1)
+        # Well below LOG_FLUSH_EVERY, yet already on disk.
+        on_disk = log_file.read_bytes()
+        await PipelineLogger.stop_writer()
+        return on_disk
+
+    on_disk = asyncio.run(run())
+    PipelineLogger.close()
+    assert orjson.loads(on_disk)["type"] == "EVENT"
+
+
+def test_start_drains_log_when_launch_fails(tmp_path, monkeypatch):
+    log_file = tmp_path / "pipeline_crash.log"
+    monkeypatch.setattr(backbone_crawler, "LOG_FILE", str(log_file))
+    PipelineLogger.close()
+
+    def broken_playwright():
+        PipelineLogger.log_event("BEFORE_LAUNCH", {})
+        raise RuntimeError("no browser")
+
+    monkeypatch.setattr(backbone_crawler, "async_playwright", broken_playwright)
+    with pytest.raises(RuntimeError):
+        asyncio.run(P4NScraper(is_dev=True).start())
+    PipelineLogger.close()
+
+    assert PipelineLogger._queue is None
+    assert orjson.loads(log_file.read_bytes())["type"] == "BEFORE_LAUNCH"
+
+
+def test_pipeline_logger_accepts_events_from_threads(tmp_path, monkeypatch):
+    log_file = tmp_path / "pipeline_thread.log"
+    monkeypatch.setattr(backbone_crawler, "LOG_FILE", str(log_file))
+    PipelineLogger.close()
+
+    async def run():
+        PipelineLogger.start_writer()
+        # e.g. a save error raised inside _upsert_and_save's worker thread
+        await asyncio.to_thread(PipelineLogger.log_event, "FROM_THREAD", {})
+        await PipelineLogger.stop_writer()
+
+    asyncio.run(run())
+    PipelineLogger.close()
+    assert orjson.loads(log_file.read_bytes())["type"] == "FROM_THREAD"
+
+
+def test_each_start_owns_and_closes_its_gemini_client(monkeypatch):
+    created = []
+
+    def fake_pool():
+        http = backbone_crawler.httpx.AsyncClient()
+        created.append(http)
+        return http, fake_client([])
+
+    def broken_playwright():
+        raise RuntimeError("no browser")
+
+    monkeypatch.setattr(backbone_crawler, "pooled_gemini_client", fake_pool)
+    monkeypatch.setattr(backbone_crawler, "async_playwright", broken_playwright)
+    scraper = P4NScraper(is_dev=True)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(scraper.start())
+
+    assert len(created) == 2 and all(http.is_closed for http in created)
+    assert scraper.client is backbone_crawler.client
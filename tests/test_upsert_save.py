@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 
@@ -115,3 +116,92 @@ def test_p4n_id_type_coercion(tmp_path):
     # ensure only one row and title is new
     assert df.shape[0] == 1
     assert df.loc[0, "title"] == "string-id-new"
+
+
+def test_new_ids_are_appended_without_rewriting(tmp_path):
+    out = tmp_path / "out5.csv"
+    existing = pd.DataFrame(
+        [{"title": "first", "p4n_id": 700, "url": "u", "last_scraped": "2025-12-01 00:00:00"}]
+    )
+    existing.to_csv(out, index=False)
+    original = out.read_text()
+
+    scraper = P4NScraper(is_dev=True)
+    scraper.csv_file = str(out)
+    scraper.existing_df = pd.read_csv(scraper.csv_file)
+    scraper.processed_batch = [make_row(701, "2026-01-22 14:00:00")]
+    scraper._upsert_and_save()
+
+    text = out.read_text()
+    # existing bytes untouched, new row follows the existing column order
+    assert text.startswith(original)
+    assert text[len(original):] == "place-701,701,,2026-01-22 14:00:00\n"
+
+
+def test_flush_batch_then_update_same_id(tmp_path, monkeypatch):
+    out = tmp_path / "out6.csv"
+    pd.DataFrame([make_row(800, "2025-11-01 00:00:00")]).to_csv(out, index=False)
+
+    scraper = P4NScraper(is_dev=True)
+    scraper.csv_file = str(out)
+    scraper.existing_df = scraper._load_existing()
+
+    # The flush records saved ids in memory instead of re-reading the CSV.
+    monkeypatch.setattr(
+        scraper, "_load_existing", lambda *a, **k: pytest.fail("store re-read")
+    )
+    scraper.processed_batch = [make_row(801, "2026-01-22 15:00:00", title="first")]
+    asyncio.run(scraper._flush_batch())
+    assert scraper.processed_batch == []
+    assert sorted(scraper.existing_df["p4n_id"]) == ["800", "801"]
+
+    # the flushed id is now known, so a rescrape replaces instead of duplicating
+    scraper.processed_batch = [make_row(801, "2026-01-23 15:00:00", title="second")]
+    scraper._upsert_and_save()
+
+    df = pd.read_csv(out)
+    assert sorted(df["p4n_id"].astype(str)) == ["800", "801"]
+    assert df.loc[df["p4n_id"] == 801, "title"].item() == "second"
+
+
+def test_unreadable_store_is_appended_not_overwritten(tmp_path, monkeypatch):
+    out = tmp_path / "out7.csv"
+    pd.DataFrame([make_row(900, "2025-11-01 00:00:00")]).to_csv(out, index=False)
+
+    scraper = P4NScraper(is_dev=True)
+    scraper.csv_file = str(out)
+    scraper.existing_df = scraper._load_existing()
+    scraper.processed_batch = [make_row(900, "2026-01-22 16:00:00", title="new")]
+
+    # The store exists but cannot be read back at save time.
+    def broken_read(*args, **kwargs):
+        raise OSError("read failed")
+
+    monkeypatch.setattr(scraper, "_read_store", broken_read)
+    scraper._upsert_and_save()
+
+    df = pd.read_csv(out)
+    assert df["title"].tolist() == ["place-900", "new"]
+
+
+def test_known_ids_are_updated_in_place(tmp_path):
+    out = tmp_path / "out8.csv"
+    pd.DataFrame(
+        [make_row(pid, "2025-11-01 00:00:00") for pid in (1, 2, 3)]
+    ).to_csv(out, index=False)
+
+    scraper = P4NScraper(is_dev=True)
+    scraper.csv_file = str(out)
+    scraper.existing_df = scraper._load_existing()
+    scraper.processed_batch = [
+        make_row(4, "2026-01-22 17:00:00"),
+        make_row(2, "2026-01-22 17:00:00", title="updated"),
+    ]
+    scraper._upsert_and_save()
+
+    df = pd.read_csv(out)
+    # Stored order and header survive; only row 2 changes, 4 is appended.
+    assert list(df.columns) == ["p4n_id", "title", "last_scraped"]
+    assert df["p4n_id"].tolist() == [1, 2, 3, 4]
+    assert df["title"].tolist() == ["place-1", "updated", "place-3", "place-4"]
+    assert df.loc[1, "last_scraped"] == "2026-01-22 17:00:00"